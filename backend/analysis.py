@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import re
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+# Bump when the prompts change so cached per-file results are not reused.
+PROMPT_VERSION = "1"
+
+# Top-level definitions in the languages people usually upload. Chunks are
+# cut at these lines so a function is not split across two model calls.
+BOUNDARY = re.compile(
+    r"^(?:"
+    r"(?:async\s+)?def\s|class\s|@"                                    # Python
+    r"|(?:export\s+)?(?:default\s+)?(?:async\s+)?function[\s*]"        # JS/TS
+    r"|(?:export\s+)?(?:default\s+)?class\s"
+    r"|(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?\("
+    r"|func\s|type\s+\w+\s+(?:struct|interface)"                       # Go
+    r"|(?:pub\s+)?(?:fn|struct|enum|impl|trait)\s"                     # Rust
+    r"|(?:public|private|protected|static|internal)\s"                 # Java/C#/PHP
+    r")"
+)
+
+CHUNK_PROMPT = (
+    "You are reviewing part {part} of {total} of the file {name}.\n"
+    "Explain its logic and list concrete issues and improvements. Be concise.\n\n"
+    "{code}"
+)
+FILE_PROMPT = (
+    "Below are review notes for consecutive parts of the file {name}.\n"
+    "Merge them into one review of the file: logic, issues, improvements. "
+    "Remove duplicates.\n\n{notes}"
+)
+REPORT_PROMPT = (
+    "Below are reviews of individual code files from one project.\n"
+    "Write a single report explaining the code clearly, focusing on logic, "
+    "issues across files, and prioritized improvements.\n\n{notes}"
+)
+
+
+def file_key(digest: str, model: str):
+    return f"file:{PROMPT_VERSION}:{model}:{digest}"
+
+
+def is_binary(data: bytes):
+    return b"\0" in data[:8192]
+
+
+def split_segments(text: str):
+    segments, current = [], []
+    for line in text.splitlines(keepends=True):
+        if current and BOUNDARY.match(line):
+            segments.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+def split_oversized(segment: str, max_chars: int):
+    # A single definition larger than a chunk: fall back to line boundaries,
+    # and hard-split lines that are themselves too long (minified code).
+    pieces, current = [], ""
+    for line in segment.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int):
+    """Packs whole definitions into chunks of at most `max_chars`."""
+    chunks, current = [], ""
+    for segment in split_segments(text):
+        if len(segment) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(split_oversized(segment, max_chars))
+        elif len(current) + len(segment) > max_chars:
+            chunks.append(current)
+            current = segment
+        else:
+            current += segment
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+async def reduce_notes(complete, notes: list, template: str, max_chars: int, **fields):
+    """Reduces notes with one call, or tree-wise when they don't fit in one."""
+    if len(notes) == 1:
+        return notes[0]
+
+    groups, current = [], []
+    for note in notes:
+        if current and sum(len(n) for n in current) + len(note) > max_chars:
+            groups.append(current)
+            current = []
+        current.append(note)
+    groups.append(current)
+
+    if len(groups) == 1:
+        return await complete(template.format(notes="\n\n---\n\n".join(notes), **fields))
+
+    partial = await asyncio.gather(*[
+        reduce_notes(complete, group, template, max_chars, **fields) for group in groups
+    ])
+    if len(partial) == len(notes):
+        # Every note is at the size limit on its own; merging cannot shrink
+        # the input further, so trim and finish in one call.
+        partial = [note[: max_chars // len(notes)] for note in notes]
+        return await complete(template.format(notes="\n\n---\n\n".join(partial), **fields))
+    return await reduce_notes(complete, list(partial), template, max_chars, **fields)
+
+
+async def analyze_file(complete, name: str, text: str, max_chars: int):
+    chunks = chunk_text(text, max_chars)
+    if not chunks:
+        return "The file is empty.", 0
+
+    notes = await asyncio.gather(*[
+        complete(CHUNK_PROMPT.format(part=i + 1, total=len(chunks), name=name, code=chunk))
+        for i, chunk in enumerate(chunks)
+    ])
+    return await reduce_notes(complete, list(notes), FILE_PROMPT, max_chars, name=name), len(chunks)
+
+
+async def hash_upload(upload, max_bytes: int, block_size: int = 64 * 1024):
+    """Hashes an upload block by block; returns None when it is too large."""
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while block := await upload.read(block_size):
+        size += len(block)
+        if size > max_bytes:
+            return None
+        digest.update(block)
+    await upload.seek(0)
+    return digest.hexdigest()
+
+
+class UploadLimitMiddleware:
+    """Rejects request bodies over `max_bytes` on `path` while they arrive.
+
+    The multipart parser writes uploads to disk before the endpoint runs, so
+    the limit has to be enforced here: up front from Content-Length, and by
+    counting bytes for chunked bodies that don't declare one.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload exceeds {self.max_bytes} bytes"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
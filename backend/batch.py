@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import asyncio
+import secrets
+import time
+
+from fastapi import HTTPException
+
+from ratelimit import Overloaded, backoff_delay
+
+
+async def run_item(index: int, item, handle):
+    try:
+        return {"index": index, "status": "ok", **(await handle(item))}
+    except HTTPException as e:
+        return {"index": index, "status": "error", "code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        return {"index": index, "status": "error", "code": 500, "detail": str(e) or type(e).__name__}
+
+
+async def retry_overloaded(call, max_wait: float, base_delay: float, max_delay: float):
+    """Awaits `call()`, retrying while admission control reports overload.
+
+    Gives up with the last Overloaded once another wait would run past
+    `max_wait` seconds, so a saturated upstream cannot stall an item forever.
+    """
+    deadline = time.monotonic() + max_wait
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Overloaded as e:
+            delay = backoff_delay(attempt, base_delay, max_delay, e.retry_after)
+            if time.monotonic() + delay > deadline:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def run_batch(items: list, handle, concurrency: int):
+    """Runs `handle` over `items` with at most `concurrency` in flight.
+
+    Yields one result per item in completion order, so a slow or failing
+    item never holds back the others. Closing the generator cancels the
+    items still running.
+    """
+    pending = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+    done = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            done.put_nowait(await run_item(index, item, handle))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await done.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+class BatchJob:
+    def __init__(self, total: int):
+        self.id = secrets.token_urlsafe(12)
+        self.total = total
+        self.results = [None] * total
+        self.completed = 0
+        self.failed = 0
+        self.status = "running"
+        self.finished_at = None
+        self.task = None
+
+    def record(self, result: dict):
+        self.results[result["index"]] = result
+        self.completed += 1
+        if result["status"] != "ok":
+            self.failed += 1
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.monotonic()
+
+    def to_dict(self, offset: int = 0, limit: int = None):
+        end = self.total if limit is None else offset + limit
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "offset": offset,
+            "results": self.results[offset:end],
+        }
+
+
+class JobStore:
+    """Keeps batch jobs in memory; finished jobs expire after `ttl` seconds.
+
+    The store is per worker process: with several gunicorn workers a job can
+    only be polled or cancelled through the worker that created it, so run
+    job-based batches with one worker or behind sticky routing.
+    """
+
+    def __init__(self, max_jobs: int, ttl: float):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+
+    def add(self, job: BatchJob):
+        self.evict()
+        if len(self._jobs) >= self.max_jobs:
+            raise HTTPException(status_code=503, detail="Too many batch jobs, try again later")
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str):
+        self.evict()
+        return self._jobs.get(job_id)
+
+    def evict(self):
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.finished_at is not None and now - job.finished_at > self.ttl:
+                del self._jobs[job.id]
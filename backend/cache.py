@@ -0,0 +1,145 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import time
+
+
+def _normalize_text(text: str):
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def cache_key(payload: dict):
+    # Normalize so that trivially different requests (key order, surrounding
+    # and trailing whitespace) map to the same entry. Whitespace inside the
+    # text is kept: in code, indentation changes the meaning.
+    normalized = dict(payload)
+    normalized["messages"] = [
+        {"role": m["role"], "content": _normalize_text(str(m["content"]))}
+        for m in payload.get("messages", [])
+    ]
+    normalized.pop("stream", None)
+    blob = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+# ---------------- BACKENDS ----------------
+class MemoryBackend:
+    """In-process LRU with per-entry TTL and an entry/byte bound."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()  # key -> (expires_at, value, size)
+
+    async def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict, ttl: float):
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._evict(key)
+        self._data[key] = (time.monotonic() + ttl, value, size)
+        self.size += size
+        while len(self._data) > self.max_entries or self.size > self.max_bytes:
+            self._evict(next(iter(self._data)))
+
+    def _evict(self, key: str):
+        _, _, size = self._data.pop(key)
+        self.size -= size
+
+
+class RedisBackend:
+    """Shared cache for multi-worker deployments (needs the `redis` package)."""
+
+    def __init__(self, url: str, prefix: str = "chat:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: dict, ttl: float):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+# ---------------- CACHE ----------------
+class ResponseCache:
+    """Response cache with in-flight coalescing of identical requests.
+
+    `fetch` returns `(value, status)` where status is HIT, MISS or COALESCED
+    (another request for the same key was already in flight and its upstream
+    call was shared). The loader returns `(value, cacheable)`; values it
+    marks as not cacheable are still shared with coalesced callers but are
+    not stored.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+
+    async def get(self, key: str):
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            # A shared backend being down must not take /chat down with it.
+            return None
+
+    async def set(self, key: str, value: dict):
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception:
+            pass
+
+    async def fetch(self, key: str, loader):
+        value = await self.get(key)
+        if value is not None:
+            return value, "HIT"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), "COALESCED"
+
+        # The upstream call runs as its own task so that one caller
+        # disconnecting does not cancel it for everyone waiting on it.
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), "MISS"
+
+    async def _load(self, key: str, loader):
+        value, cacheable = await loader()
+        if cacheable:
+            await self.set(key, value)
+        return value
+
+    def _done(self, key: str, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away.
+            task.exception()
+
+    async def close(self):
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            await close()
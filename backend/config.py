@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -5,12 +6,118 @@ load_dotenv()
 
 ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
 
-GEMINI_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+MODEL = os.getenv("MODEL", "llama-3.1-8b-instant")
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_URL = os.getenv(
+    "GEMINI_URL", "https://generativelanguage.googleapis.com/v1beta/openai/chat/completions"
+)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# OpenAI-compatible backends, tried in order. UPSTREAM_BACKENDS may be set to
+# a JSON list of {"name", "url", "model", "api_key" or "api_key_env"}; by
+# default Groq is primary and Gemini is the fallback when its key is set.
+def _load_backends():
+    configured = os.getenv("UPSTREAM_BACKENDS")
+    if configured:
+        backends = json.loads(configured)
+        for b in backends:
+            if "api_key" not in b:
+                b["api_key"] = os.getenv(b.get("api_key_env", ""))
+        return [b for b in backends if b["api_key"]]
+
+    backends = []
+    if GROQ_API_KEY:
+        backends.append({"name": "groq", "url": GROQ_URL, "api_key": GROQ_API_KEY, "model": MODEL})
+    if GEMINI_API_KEY:
+        backends.append(
+            {"name": "gemini", "url": GEMINI_URL, "api_key": GEMINI_API_KEY, "model": GEMINI_MODEL}
+        )
+    return backends
+
+UPSTREAM_BACKENDS = _load_backends()
+
+# Hedging: a duplicate request is sent once the first has run longer than the
+# backend's recent HEDGE_QUANTILE latency, for at most HEDGE_MAX_RATIO of calls.
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", 0.95))
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", 3))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.2))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", 15))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", 0.1))
+
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", 30))
 
 AI_TIMEOUT = int(os.getenv("AI_TIMEOUT", 60))
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", 10))
+
+# Upstream connection pool (one client per worker, shared by all requests)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 200))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 50))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP2 = os.getenv("HTTP2", "true").lower() == "true"
 
+# Response cache (CACHE_BACKEND: memory | redis)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL = int(os.getenv("CACHE_TTL", 600))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 32 * 1024 * 1024))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Admission control: RATE_LIMIT requests per RATE_WINDOW seconds per client,
+# GLOBAL_RATE_LIMIT upstream calls per RATE_WINDOW per backend per worker.
 RATE_LIMIT = int(os.getenv("RATE_LIMIT", 30))
 RATE_WINDOW = int(os.getenv("RATE_WINDOW", 60))
+GLOBAL_RATE_LIMIT = int(os.getenv("GLOBAL_RATE_LIMIT", 300))
+GLOBAL_RATE_BURST = int(os.getenv("GLOBAL_RATE_BURST", 20))
+QUEUE_MAX_WAITERS = int(os.getenv("QUEUE_MAX_WAITERS", 200))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 15))
+
+# Retries only happen once there is no healthy backend left to fail over to.
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 3))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 20))
 
 MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", 10))
 MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", 8000))
+
+# Chat messages longer than MAX_PROMPT_CHARS are rejected with 413.
+# Conversation sessions: the new message plus its history must fit in
+# HISTORY_TOKEN_BUDGET, and stored history is capped at MAX_HISTORY_MESSAGES.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", MAX_PROMPT_CHARS // 4))
+SESSION_SUMMARIZE = os.getenv("SESSION_SUMMARIZE", "true").lower() == "true"
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", 5000))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", 1800))
+
+# /analyze/files: uploads are split into chunks of ANALYZE_CHUNK_CHARS and
+# at most ANALYZE_CONCURRENCY chunks are sent upstream at once per request.
+ANALYZE_MAX_FILES = int(os.getenv("ANALYZE_MAX_FILES", 20))
+ANALYZE_MAX_FILE_BYTES = int(os.getenv("ANALYZE_MAX_FILE_BYTES", 2 * 1024 * 1024))
+# Whole request body, checked while it streams in. Decoded file texts are kept
+# in memory during analysis, up to ANALYZE_MAX_FILES * ANALYZE_MAX_FILE_BYTES.
+ANALYZE_MAX_UPLOAD_BYTES = int(os.getenv(
+    "ANALYZE_MAX_UPLOAD_BYTES", ANALYZE_MAX_FILES * ANALYZE_MAX_FILE_BYTES + 1024 * 1024
+))
+ANALYZE_CHUNK_CHARS = int(os.getenv("ANALYZE_CHUNK_CHARS", MAX_PROMPT_CHARS))
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", 4))
+
+# Batches: BATCH_CONCURRENCY items in flight per batch unless the request
+# asks for a different value (capped at BATCH_MAX_CONCURRENCY). Each item is
+# charged against the client's RATE_LIMIT. Batch jobs are kept in memory by
+# the worker that created them and are not shared across gunicorn workers.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 32))
+BATCH_JOB_MAX_ITEMS = int(os.getenv("BATCH_JOB_MAX_ITEMS", 20000))
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 50))
+BATCH_JOB_TTL = int(os.getenv("BATCH_JOB_TTL", 3600))
+# How long an item keeps waiting out upstream overload before it fails with 503.
+BATCH_OVERLOAD_WAIT = float(os.getenv("BATCH_OVERLOAD_WAIT", 120))
+
+# Requests slower than this are logged with their per-stage timings.
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 10))
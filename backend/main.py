@@ -1,13 +1,153 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import requests
-import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import asyncio
+import json
 import time
 
+from fastapi import Depends, FastAPI, File, HTTPException, Request, Response, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+import httpx
+
+from config import (
+    AI_TIMEOUT,
+    AI_CONNECT_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2,
+    CACHE_ENABLED,
+    CACHE_BACKEND,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_BYTES,
+    REDIS_URL,
+    UPSTREAM_BACKENDS,
+    HEDGE_ENABLED,
+    HEDGE_QUANTILE,
+    HEDGE_INITIAL_DELAY,
+    HEDGE_MIN_DELAY,
+    HEDGE_MAX_DELAY,
+    HEDGE_MAX_RATIO,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    RATE_LIMIT,
+    RATE_WINDOW,
+    GLOBAL_RATE_LIMIT,
+    GLOBAL_RATE_BURST,
+    QUEUE_MAX_WAITERS,
+    QUEUE_TIMEOUT,
+    UPSTREAM_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    MAX_HISTORY_MESSAGES,
+    MAX_PROMPT_CHARS,
+    HISTORY_TOKEN_BUDGET,
+    SESSION_SUMMARIZE,
+    SESSION_MAX_COUNT,
+    SESSION_MAX_BYTES,
+    SESSION_IDLE_TTL,
+    ANALYZE_MAX_FILES,
+    ANALYZE_MAX_FILE_BYTES,
+    ANALYZE_MAX_UPLOAD_BYTES,
+    ANALYZE_CHUNK_CHARS,
+    ANALYZE_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_JOB_MAX_ITEMS,
+    BATCH_MAX_JOBS,
+    BATCH_JOB_TTL,
+    BATCH_OVERLOAD_WAIT,
+    SLOW_REQUEST_SECONDS,
+)
+from analysis import (
+    REPORT_PROMPT,
+    UploadLimitMiddleware,
+    analyze_file,
+    file_key,
+    hash_upload,
+    is_binary,
+    reduce_notes,
+)
+from cache import ResponseCache, MemoryBackend, RedisBackend, cache_key
+from ratelimit import (
+    AdmissionControl,
+    client_id,
+    parse_retry_after,
+    retry_after_header,
+)
+from batch import BatchJob, JobStore, retry_overloaded, run_batch
+import metrics
+from routing import Backend, CircuitBreaker, Router, UpstreamError
+from sessions import Session, SessionStore, estimate_tokens
+
+# ---------------- LIFESPAN ----------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive client per worker: connections (and their TLS sessions)
+    # are reused across requests instead of being set up for every call.
+    app.state.http = httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(AI_TIMEOUT, connect=AI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    if CACHE_BACKEND == "redis":
+        backend = RedisBackend(REDIS_URL)
+    else:
+        backend = MemoryBackend(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+    app.state.cache = ResponseCache(backend, CACHE_TTL)
+    app.state.admission = AdmissionControl(
+        client_limit=RATE_LIMIT,
+        global_limit=GLOBAL_RATE_LIMIT,
+        window=RATE_WINDOW,
+        global_burst=GLOBAL_RATE_BURST,
+        max_waiters=QUEUE_MAX_WAITERS,
+        queue_timeout=QUEUE_TIMEOUT,
+    )
+    app.state.router = Router(
+        [
+            Backend(
+                b["name"],
+                b["url"],
+                b["api_key"],
+                b["model"],
+                CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN),
+            )
+            for b in UPSTREAM_BACKENDS
+        ],
+        admission=app.state.admission,
+        hedge=HEDGE_ENABLED,
+        hedge_quantile=HEDGE_QUANTILE,
+        initial_delay=HEDGE_INITIAL_DELAY,
+        min_delay=HEDGE_MIN_DELAY,
+        max_delay=HEDGE_MAX_DELAY,
+        max_ratio=HEDGE_MAX_RATIO,
+        retries=UPSTREAM_RETRIES,
+        retry_base_delay=RETRY_BASE_DELAY,
+        retry_max_delay=RETRY_MAX_DELAY,
+    )
+    app.state.sessions = SessionStore(SESSION_MAX_COUNT, SESSION_MAX_BYTES, SESSION_IDLE_TTL)
+    app.state.tasks = set()
+    app.state.jobs = JobStore(BATCH_MAX_JOBS, BATCH_JOB_TTL)
+    try:
+        yield
+    finally:
+        for task in app.state.tasks:
+            task.cancel()
+        await app.state.http.aclose()
+        await app.state.cache.close()
+
 # ---------------- APP ----------------
-app = FastAPI(title="AI Agentic Backend (Groq)")
+app = FastAPI(title="AI Agentic Backend (Groq)", lifespan=lifespan)
 
+app.add_middleware(UploadLimitMiddleware, path="/analyze/files", max_bytes=ANALYZE_MAX_UPLOAD_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -18,61 +158,497 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Cache", "X-Session-ID"],
 )
-
-# ---------------- CONFIG ----------------
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-MODEL = "llama-3.1-8b-instant"
+app.add_middleware(metrics.MetricsMiddleware, slow_request_seconds=SLOW_REQUEST_SECONDS)
 
 # ---------------- MODELS ----------------
 class ChatRequest(BaseModel):
     message: str
+    cache: bool = True
+    session_id: Optional[str] = None
 
-# ---------------- HEALTH ----------------
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+class BatchRequest(BaseModel):
+    prompts: List[str] = Field(min_length=1)
+    cache: bool = True
+    concurrency: Optional[int] = Field(default=None, ge=1)
 
-# ---------------- CHAT ----------------
-@app.post("/chat")
-def chat(req: ChatRequest):
-    if not GROQ_API_KEY:
-        raise HTTPException(status_code=500, detail="GROQ_API_KEY missing")
+# ---------------- UPSTREAM ----------------
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures where the request never reached the model and is safe to resend.
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
 
+def upstream_headers(backend: Backend):
     headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Authorization": f"Bearer {backend.api_key}",
         "Content-Type": "application/json"
     }
+    ctx = metrics.current.get()
+    if ctx is not None:
+        headers["X-Request-ID"] = ctx.id
+    return headers
+
+def primary_model(app: FastAPI):
+    # Payloads and cache keys name the first backend's model. Replies served
+    # by a failover backend use another model and are not cached under them.
+    return app.state.router.backends[0].model
+
+def build_payload(app: FastAPI, message: str, session: Session = None):
+    message = message.strip()
+    if len(message) > MAX_PROMPT_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Message exceeds {MAX_PROMPT_CHARS} characters"
+        )
+    # The new message comes out of the same budget as the history before it.
+    budget = HISTORY_TOKEN_BUDGET - estimate_tokens(message)
+    history = session.context(budget) if session else []
+    return {
+        "model": primary_model(app),
+        "messages": history + [
+            {
+                "role": "user",
+                "content": message
+            }
+        ]
+    }
+
+async def upstream_send(app: FastAPI, backend: Backend, payload: dict, stream: bool = False):
+    # A single call to one backend. Admission, failover and retries are left
+    # to the router, which has already taken a token for this attempt.
+    client = app.state.http
+    payload = {**payload, "model": backend.model}
+
+    tracer = metrics.Tracer()
+    request = client.build_request(
+        "POST",
+        backend.url,
+        headers=upstream_headers(backend),
+        json=payload,
+        extensions={"trace": tracer},
+    )
+    try:
+        response = await client.send(request, stream=stream)
+    except httpx.HTTPError as e:
+        metrics.UPSTREAM_RESPONSES.inc(backend=backend.name, status="error")
+        raise UpstreamError(str(e) or type(e).__name__, retryable=isinstance(e, RETRY_ERRORS))
+
+    metrics.UPSTREAM_RESPONSES.inc(backend=backend.name, status=response.status_code)
+    tracer.observe()
+    if response.status_code == 200:
+        if not stream and tracer.headers_received is not None:
+            # The body has been read by now; streams are timed by the relay.
+            metrics.observe_stage("generation", time.perf_counter() - tracer.headers_received)
+        return response
+
+    if stream:
+        await response.aread()
+        await response.aclose()
+
+    retry_after = parse_retry_after(response.headers.get("retry-after"))
+    raise UpstreamError(
+        response.text,
+        response.status_code,
+        retry_after_header(retry_after) if retry_after is not None else None,
+        retryable=response.status_code in RETRY_STATUSES,
+        retry_after=retry_after,
+    )
+
+async def groq_stream_open(app: FastAPI, payload: dict):
+    # Streams are hedged on time to first byte; the losing response is closed.
+    # Returns the open response and the backend that served it.
+    return await app.state.router.run(
+        lambda backend: upstream_send(app, backend, payload, stream=True),
+        kind="stream",
+        discard=lambda response: response.aclose(),
+    )
+
+async def groq_completion(app: FastAPI, payload: dict):
+    async def attempt(backend: Backend):
+        response = await upstream_send(app, backend, payload)
+        decoding = time.perf_counter()
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise UpstreamError(f"Invalid upstream JSON: {e}")
+        metrics.observe_stage("decode", time.perf_counter() - decoding)
+        metrics.record_usage(data)
+        return data
+
+    return await app.state.router.run(attempt)
+
+async def groq_reply(app: FastAPI, payload: dict):
+    # Also returns the backend, whose model may differ from payload["model"].
+    data, backend = await groq_completion(app, payload)
+    try:
+        return {
+            "reply": data["choices"][0]["message"]["content"]
+        }, backend
+    except (KeyError, IndexError, TypeError) as e:
+        raise HTTPException(status_code=503, detail=f"Malformed upstream response: {e}")
+
+async def cached_reply(app: FastAPI, payload: dict, use_cache: bool = True):
+    if not (CACHE_ENABLED and use_cache):
+        metrics.CACHE_REQUESTS.inc(cache="chat", result="BYPASS")
+        result, _ = await groq_reply(app, payload)
+        return result, "BYPASS"
+
+    async def load():
+        result, backend = await groq_reply(app, payload)
+        # A failover reply comes from a different model than the key names.
+        return result, backend.model == payload["model"]
+
+    result, status = await app.state.cache.fetch(cache_key(payload), load)
+    metrics.CACHE_REQUESTS.inc(cache="chat", result=status)
+    return result, status
+
+def sse(data: dict, event: str = None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def groq_stream(request: Request, response: httpx.Response, on_complete=None):
+    # Relays upstream token deltas as SSE. The upstream response is closed
+    # when the relay ends for any reason, including the task being cancelled
+    # because the client went away. `on_complete` only sees full replies.
+    parts = []
+    finished = False
+    started = time.perf_counter()
+    try:
+        async for line in response.aiter_lines():
+            if await request.is_disconnected():
+                return
+            if not line.startswith("data:"):
+                continue
+            chunk = line[len("data:"):].strip()
+            if chunk == "[DONE]":
+                finished = True
+                break
+            try:
+                data = json.loads(chunk)
+                metrics.record_usage(data)
+                delta = data["choices"][0]["delta"].get("content")
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                continue
+            if delta:
+                parts.append(delta)
+                yield sse({"delta": delta})
+    except httpx.HTTPError as e:
+        yield sse({"detail": str(e) or type(e).__name__}, event="error")
+        return
+    finally:
+        metrics.observe_stage("generation", time.perf_counter() - started)
+        await response.aclose()
+
+    if on_complete is not None and finished and parts:
+        await on_complete("".join(parts))
+    yield sse({}, event="done")
+
+async def replay_stream(reply: str):
+    yield sse({"delta": reply})
+    yield sse({}, event="done")
+
+# ---------------- SESSIONS ----------------
+def get_session(request: Request, session_id: Optional[str]):
+    if session_id is None:
+        return None
+    session = request.app.state.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+def record_turn(app: FastAPI, session: Optional[Session], message: str, reply: str):
+    if session is None:
+        return
+    session.append(message.strip(), reply)
+    session.trim(HISTORY_TOKEN_BUDGET, MAX_HISTORY_MESSAGES, keep_pending=SESSION_SUMMARIZE)
+    app.state.sessions.resize(session)
+    app.state.sessions.evict()
+
+    if session.pending and not session.summarizing:
+        task = asyncio.create_task(summarize_session(app, session))
+        app.state.tasks.add(task)
+        task.add_done_callback(app.state.tasks.discard)
 
+async def summarize_session(app: FastAPI, session: Session):
+    # Folds turns that fell out of the history window into a short rolling
+    # summary, off the request path.
+    session.summarizing = True
+    pending, session.pending = session.pending, []
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in pending)
     payload = {
-        "model": "llama-3.1-8b-instant",
+        "model": primary_model(app),
         "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "Update the running summary of a conversation. Keep names, facts, "
+                    "decisions and open questions. Reply with the summary only, "
+                    "in under 150 words."
+                )
+            },
             {
                 "role": "user",
-                "content": req.message.strip()
+                "content": f"Current summary:\n{session.summary or '(none)'}\n\nNew turns:\n{transcript}"
             }
         ]
     }
-
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
+        result, _ = await groq_reply(app, payload)
+        session.summary = result["reply"].strip()
+    except HTTPException:
+        # Losing the oldest turns is the same outcome as running without
+        # summaries; keeping them around would defeat the memory cap.
+        pass
+    finally:
+        session.summarizing = False
+        app.state.sessions.resize(session)
+
+@app.post("/sessions")
+async def create_session(request: Request):
+    return {"session_id": request.app.state.sessions.create().id}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, request: Request):
+    if not request.app.state.sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "deleted"}
+
+# ---------------- ADMISSION ----------------
+async def admit(request: Request):
+    request.app.state.admission.check_client(client_id(request))
+
+# ---------------- HEALTH ----------------
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics_endpoint(request: Request):
+    router = request.app.state.router
+    metrics.UPSTREAM_HEDGES.set(router.hedges)
+    for backend in router.backends:
+        metrics.CIRCUIT_OPEN.set(int(backend.breaker.state == "open"), backend=backend.name)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ---------------- CHAT ----------------
+@app.post("/chat", dependencies=[Depends(admit)])
+async def chat(req: ChatRequest, request: Request, response: Response):
+    if not UPSTREAM_BACKENDS:
+        raise HTTPException(status_code=500, detail="No upstream configured (GROQ_API_KEY missing)")
+
+    app = request.app
+    session = get_session(request, req.session_id)
+    payload = build_payload(app, req.message, session)
+
+    result, status = await cached_reply(app, payload, req.cache)
+    response.headers["X-Cache"] = status
+
+    if session is not None:
+        record_turn(app, session, req.message, result["reply"])
+        return {**result, "session_id": session.id}
+    return result
+
+@app.post("/chat/stream", dependencies=[Depends(admit)])
+async def chat_stream(req: ChatRequest, request: Request):
+    if not UPSTREAM_BACKENDS:
+        raise HTTPException(status_code=500, detail="No upstream configured (GROQ_API_KEY missing)")
+
+    app = request.app
+    session = get_session(request, req.session_id)
+    payload = build_payload(app, req.message, session)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session is not None:
+        headers["X-Session-ID"] = session.id
+    key = None
+
+    if CACHE_ENABLED and req.cache:
+        key = cache_key(payload)
+        cached = await app.state.cache.get(key)
+        if cached is not None:
+            metrics.CACHE_REQUESTS.inc(cache="chat", result="HIT")
+            record_turn(app, session, req.message, cached["reply"])
+            return StreamingResponse(
+                replay_stream(cached["reply"]),
+                media_type="text/event-stream",
+                headers={**headers, "X-Cache": "HIT"},
+            )
+        headers["X-Cache"] = "MISS"
+    else:
+        headers["X-Cache"] = "BYPASS"
+    metrics.CACHE_REQUESTS.inc(cache="chat", result=headers["X-Cache"])
+
+    async def on_complete(reply: str):
+        if key is not None:
+            await app.state.cache.set(key, {"reply": reply})
+        record_turn(app, session, req.message, reply)
+
+    # Open the upstream stream before responding so rate limiting and
+    # upstream failures surface as a proper status code, not a 200.
+    upstream, backend = await groq_stream_open(app, {**payload, "stream": True})
+    if backend.model != payload["model"]:
+        key = None
+    return StreamingResponse(
+        groq_stream(request, upstream, on_complete),
+        media_type="text/event-stream",
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
+
+# ---------------- FILE ANALYSIS ----------------
+@app.post("/analyze/files", dependencies=[Depends(admit)])
+async def analyze_files(request: Request, files: List[UploadFile] = File(...)):
+    # Uploads are spooled to temporary files by the multipart parser (the
+    # request size is capped by UploadLimitMiddleware). Files are analyzed
+    # concurrently, so up to ANALYZE_MAX_FILES decoded texts are held at once.
+    if not UPSTREAM_BACKENDS:
+        raise HTTPException(status_code=500, detail="No upstream configured (GROQ_API_KEY missing)")
+    if len(files) > ANALYZE_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {ANALYZE_MAX_FILES} files per request")
 
-        if response.status_code != 200:
+    digests = []
+    for upload in files:
+        digest = await hash_upload(upload, ANALYZE_MAX_FILE_BYTES)
+        if digest is None:
             raise HTTPException(
-                status_code=503,
-                detail=response.text
+                status_code=413,
+                detail=f"{upload.filename} exceeds {ANALYZE_MAX_FILE_BYTES} bytes"
             )
+        digests.append(digest)
 
-        data = response.json()
-        return {
-            "reply": data["choices"][0]["message"]["content"]
-        }
+    app = request.app
+    model = primary_model(app)
+    semaphore = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+    fallback = set()  # files with a chunk answered by a failover model
+
+    async def complete(prompt: str, digest: str = None):
+        async with semaphore:
+            payload = {"model": model, "messages": [{"role": "user", "content": prompt}]}
+            result, backend = await groq_reply(app, payload)
+        if backend.model != model:
+            fallback.add(digest)
+        return result["reply"]
+
+    async def process(upload: UploadFile, digest: str):
+        name = upload.filename or "upload"
+        data = await upload.read()
+        if is_binary(data):
+            return {"name": name, "sha256": digest, "skipped": "binary file"}
+        text = data.decode("utf-8", errors="replace")
+        del data
+
+        async def load():
+            analysis, chunks = await analyze_file(
+                lambda prompt: complete(prompt, digest), name, text, ANALYZE_CHUNK_CHARS
+            )
+            return {"analysis": analysis, "chunks": chunks}, digest not in fallback
+
+        # Keyed by content hash: re-uploading an unchanged file is free.
+        if CACHE_ENABLED:
+            result, status = await app.state.cache.fetch(file_key(digest, model), load)
+        else:
+            result, status = (await load())[0], "BYPASS"
+        metrics.CACHE_REQUESTS.inc(cache="file", result=status)
+        return {"name": name, "sha256": digest, "cached": status in ("HIT", "COALESCED"), **result}
+
+    results = await asyncio.gather(*[
+        process(upload, digest) for upload, digest in zip(files, digests)
+    ])
+
+    notes = [f"FILE: {r['name']}\n{r['analysis']}" for r in results if "analysis" in r]
+    if not notes:
+        raise HTTPException(status_code=400, detail="No text files to analyze")
+    if len(notes) == 1:
+        report = next(r["analysis"] for r in results if "analysis" in r)
+    else:
+        report = await reduce_notes(complete, notes, REPORT_PROMPT, ANALYZE_CHUNK_CHARS)
+
+    return {"reply": report, "files": results}
+
+# ---------------- BATCH ----------------
+def batch_handler(app: FastAPI, use_cache: bool, client: str):
+    async def handle(prompt: str):
+        payload = build_payload(app, prompt)
+        # Every item counts against the client's quota, as a /chat call would.
+        await app.state.admission.acquire_client(client)
+        # No upstream capacity right now is not the item's fault: wait until
+        # the limiter frees up (within BATCH_OVERLOAD_WAIT) instead of failing it.
+        result, status = await retry_overloaded(
+            lambda: cached_reply(app, payload, use_cache),
+            BATCH_OVERLOAD_WAIT,
+            RETRY_BASE_DELAY,
+            RETRY_MAX_DELAY,
+        )
+        return {**result, "cache": status}
+    return handle
+
+def batch_concurrency(req: BatchRequest):
+    # Items still go through the upstream limiters; this only bounds how many
+    # of them one batch keeps in flight.
+    return min(req.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+
+async def ndjson_results(req: BatchRequest, app: FastAPI, client: str):
+    handle = batch_handler(app, req.cache, client)
+    async for result in run_batch(req.prompts, handle, batch_concurrency(req)):
+        yield json.dumps(result) + "\n"
+
+async def run_job(job: BatchJob, req: BatchRequest, app: FastAPI, client: str):
+    handle = batch_handler(app, req.cache, client)
+    try:
+        async for result in run_batch(req.prompts, handle, batch_concurrency(req)):
+            job.record(result)
+    except asyncio.CancelledError:
+        job.finish("cancelled")
+        raise
+    job.finish("done")
+
+@app.post("/chat/batch", dependencies=[Depends(admit)])
+async def chat_batch(req: BatchRequest, request: Request):
+    if not UPSTREAM_BACKENDS:
+        raise HTTPException(status_code=500, detail="No upstream configured (GROQ_API_KEY missing)")
+    if len(req.prompts) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_MAX_ITEMS} prompts per batch, use /chat/batch/jobs"
+        )
+
+    return StreamingResponse(
+        ndjson_results(req, request.app, client_id(request)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+@app.post("/chat/batch/jobs", status_code=202, dependencies=[Depends(admit)])
+async def create_batch_job(req: BatchRequest, request: Request):
+    """Starts a batch in the background; poll it at /chat/batch/jobs/{job_id}.
+
+    Jobs live in the memory of the worker process that created them, so with
+    several workers polling needs sticky routing (or a single worker).
+    """
+    if not UPSTREAM_BACKENDS:
+        raise HTTPException(status_code=500, detail="No upstream configured (GROQ_API_KEY missing)")
+    if len(req.prompts) > BATCH_JOB_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_JOB_MAX_ITEMS} prompts per job")
+
+    app = request.app
+    job = BatchJob(len(req.prompts))
+    app.state.jobs.add(job)
+    job.task = asyncio.create_task(run_job(job, req, app, client_id(request)))
+    app.state.tasks.add(job.task)
+    job.task.add_done_callback(app.state.tasks.discard)
+    return job.to_dict(limit=0)
+
+@app.get("/chat/batch/jobs/{job_id}")
+async def get_batch_job(job_id: str, request: Request, offset: int = 0, limit: int = 100):
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict(max(0, offset), max(0, limit))
 
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=str(e))
+@app.delete("/chat/batch/jobs/{job_id}")
+async def cancel_batch_job(job_id: str, request: Request):
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job.task is not None and not job.task.done():
+        job.task.cancel()
+    return job.to_dict(limit=0)
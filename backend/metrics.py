@@ -0,0 +1,271 @@
+from contextvars import ContextVar
+import logging
+import re
+import threading
+import time
+import uuid
+
+from starlette.routing import Match
+
+logger = logging.getLogger("metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+# ---------------- REGISTRY ----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels: dict):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(list(zip(self.labels, key)))} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        # For totals that are counted elsewhere and mirrored at scrape time.
+        self.values[self.key(labels)] = value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self.values.items()):
+            pairs = list(zip(self.labels, key))
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', bound)])} {n}")
+            lines.append(f"{self.name}_bucket{_labels(pairs + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- METRICS ----------------
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the last byte of the response.",
+    ("route", "method", "status"),
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.", ("route",))
+STAGE_LATENCY = Histogram(
+    "upstream_stage_duration_seconds",
+    "Upstream call time by stage: queue, connect, ttfb, generation, decode.",
+    ("route", "stage"),
+)
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses_total",
+    "Upstream responses by backend and HTTP status ('error' for transport failures).",
+    ("backend", "status"),
+)
+UPSTREAM_TOKENS = Counter(
+    "upstream_tokens_total",
+    "Tokens reported in the upstream usage field.",
+    ("model", "kind"),
+)
+UPSTREAM_HEDGES = Counter("upstream_hedges_total", "Hedged duplicate upstream calls.")
+CIRCUIT_OPEN = Gauge("upstream_circuit_open", "1 while a backend's circuit breaker is open.", ("backend",))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Response cache lookups by result (HIT, MISS, COALESCED, BYPASS).",
+    ("cache", "result"),
+)
+
+
+# ---------------- REQUEST CONTEXT ----------------
+def route_template(scope: dict):
+    # Label by route template ("/sessions/{session_id}"), never by raw path,
+    # so metric cardinality stays bounded.
+    app = scope.get("app")
+    partial = "unmatched"
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial == "unmatched":
+            partial = route.path  # path matched, method did not
+    return partial
+
+
+class RequestContext:
+    def __init__(self, request_id: str, route: str):
+        self.id = request_id
+        self.route = route
+        self.stages = {}
+
+
+current = ContextVar("request_context", default=None)
+
+
+def current_route():
+    ctx = current.get()
+    return ctx.route if ctx else "background"
+
+
+def observe_stage(stage: str, seconds: float):
+    ctx = current.get()
+    STAGE_LATENCY.observe(seconds, route=current_route(), stage=stage)
+    if ctx is not None:
+        ctx.stages[stage] = ctx.stages.get(stage, 0.0) + seconds
+
+
+def record_usage(data: dict):
+    usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+    if not usage:
+        return
+    model = data.get("model", "unknown")
+    UPSTREAM_TOKENS.inc(usage.get("prompt_tokens", 0), model=model, kind="prompt")
+    UPSTREAM_TOKENS.inc(usage.get("completion_tokens", 0), model=model, kind="completion")
+
+
+class Tracer:
+    """httpx trace hook that turns connection events into stage timings."""
+
+    def __init__(self):
+        self.marks = {}
+
+    async def __call__(self, event: str, info: dict):
+        self.marks[event] = time.perf_counter()
+
+    def mark(self, suffix: str):
+        for event, at in self.marks.items():
+            if event.endswith(suffix):
+                return at
+        return None
+
+    def observe(self):
+        connect_started = self.mark("connect_tcp.started")
+        if connect_started is not None:
+            connected = self.mark("start_tls.complete") or self.mark("connect_tcp.complete")
+            if connected is not None:
+                observe_stage("connect", connected - connect_started)
+
+        sent = self.mark("send_request_headers.started")
+        headers = self.headers_received
+        if sent is not None and headers is not None:
+            observe_stage("ttfb", headers - sent)
+
+    @property
+    def headers_received(self):
+        return self.mark("receive_response_headers.complete")
+
+
+# ---------------- MIDDLEWARE ----------------
+REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and tags it with an X-Request-ID.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware so streamed
+    responses are timed to their last byte and disconnects still reach the
+    endpoint.
+    """
+
+    def __init__(self, app, slow_request_seconds: float):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        ctx = RequestContext(request_id, route_template(scope))
+        token = current.set(ctx)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode())
+                ]
+            await send(message)
+
+        IN_FLIGHT.inc(route=ctx.route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec(route=ctx.route)
+            elapsed = time.perf_counter() - started
+            REQUEST_LATENCY.observe(elapsed, route=ctx.route, method=scope["method"], status=status)
+            if elapsed >= self.slow_request_seconds:
+                stages = " ".join(f"{k}={v:.3f}" for k, v in ctx.stages.items())
+                logger.warning(
+                    "slow request id=%s route=%s status=%s total=%.3f %s",
+                    request_id, ctx.route, status, elapsed, stages,
+                )
+            current.reset(token)
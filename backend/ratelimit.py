@@ -0,0 +1,185 @@
+from collections import OrderedDict
+import asyncio
+import email.utils
+import math
+import random
+import time
+
+from fastapi import HTTPException, Request
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations.
+
+    A reservation takes a token immediately and returns how long the caller
+    must wait before it is actually allowed to proceed, so waiters are served
+    in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self, max_wait: float):
+        wait = self.wait_time()
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float):
+        # Upstream told us to back off: nobody gets a token for `seconds`.
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def retry_after_header(seconds: float):
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+def parse_retry_after(value: str):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float = None):
+    # Full jitter keeps retries from concurrent requests from lining up.
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, base)
+    return delay
+
+
+class Overloaded(HTTPException):
+    """503 from admission control; `retry_after` is when a token frees up."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(status_code=503, detail=detail, headers=retry_after_header(retry_after))
+        self.retry_after = retry_after
+
+
+def client_id(request: Request):
+    # X-Forwarded-For is client-controlled, so it is never read here. Behind a
+    # proxy, uvicorn rewrites request.client from that header only when the
+    # connecting peer is listed in FORWARDED_ALLOW_IPS (see the Dockerfile).
+    return request.client.host if request.client else "unknown"
+
+
+class AdmissionControl:
+    """Per-client rate limiting plus per-backend upstream limiters with a queue.
+
+    Clients over their own quota are rejected with 429. Upstream calls wait
+    on their backend's bucket in a bounded queue; when the queue is full or
+    the wait would exceed the deadline the caller gets a 503 straight away
+    rather than piling more load onto the upstream. Each backend has its own
+    bucket so one provider's rate limit does not hold back the others.
+    """
+
+    def __init__(
+        self,
+        client_limit: int,
+        global_limit: int,
+        window: float,
+        global_burst: int,
+        max_waiters: int,
+        queue_timeout: float,
+        max_clients: int = 10000,
+    ):
+        self.client_rate = client_limit / window
+        self.client_capacity = client_limit
+        self.max_clients = max_clients
+        self.clients = OrderedDict()
+        self.upstream_rate = global_limit / window
+        self.upstream_burst = global_burst
+        self.upstream = {}  # backend name -> TokenBucket
+        self.max_waiters = max_waiters
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+
+    def _client(self, key: str):
+        bucket = self.clients.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_capacity)
+            self.clients[key] = bucket
+            if len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+        self.clients.move_to_end(key)
+        return bucket
+
+    def check_client(self, key: str):
+        bucket = self._client(key)
+        if bucket.reserve(0) is None:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers=retry_after_header(bucket.wait_time()),
+            )
+
+    async def acquire_client(self, key: str):
+        """Waits for a token from the client's own quota instead of rejecting,
+        so work submitted in bulk is charged item by item."""
+        bucket = self._client(key)
+        wait = bucket.reserve(math.inf)
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            bucket.refund()
+            raise
+
+    def _upstream(self, backend: str):
+        bucket = self.upstream.get(backend)
+        if bucket is None:
+            bucket = TokenBucket(self.upstream_rate, self.upstream_burst)
+            self.upstream[backend] = bucket
+        return bucket
+
+    async def acquire_upstream(self, backend: str, max_wait: float = None):
+        """Waits for a call slot on `backend` for up to `max_wait` seconds
+        (QUEUE_TIMEOUT by default); raises Overloaded instead of waiting longer."""
+        bucket = self._upstream(backend)
+        if self.waiting >= self.max_waiters:
+            raise Overloaded("Server overloaded, queue full", bucket.wait_time())
+
+        wait = bucket.reserve(self.queue_timeout if max_wait is None else max_wait)
+        if wait is None:
+            raise Overloaded("Server overloaded, upstream quota exhausted", bucket.wait_time())
+        if wait <= 0:
+            return
+
+        self.waiting += 1
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            bucket.refund()
+            raise
+        finally:
+            self.waiting -= 1
+
+    def pause_upstream(self, backend: str, seconds: float):
+        self._upstream(backend).pause(seconds)
@@ -0,0 +1,307 @@
+from collections import deque
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from metrics import observe_stage
+from ratelimit import Overloaded, backoff_delay, retry_after_header
+
+
+class UpstreamError(HTTPException):
+    """An upstream call failed; `upstream_status` is None for transport errors.
+
+    `retryable` marks failures that are safe to send again (the request never
+    reached the model, or was rejected before any work was done).
+    """
+
+    def __init__(
+        self,
+        detail: str,
+        upstream_status: int = None,
+        headers: dict = None,
+        retryable: bool = False,
+        retry_after: float = None,
+    ):
+        super().__init__(status_code=503, detail=detail, headers=headers)
+        self.upstream_status = upstream_status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    @property
+    def backend_fault(self):
+        # Rejections of the request itself (bad payload, unknown model) would
+        # fail the same way anywhere; everything else is worth failing over.
+        status = self.upstream_status
+        return status is None or status >= 500 or status in (401, 403, 429)
+
+    @property
+    def trips_breaker(self):
+        # A 429 means the backend is up but over quota: fail over and pause
+        # its bucket, but a burst of them must not open the circuit.
+        return self.backend_fault and self.upstream_status != 429
+
+
+class LatencyTracker:
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown` seconds
+    a single probe request is let through to decide whether to close again."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    @property
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def release(self):
+        # The call let through by allow() never completed: free the probe.
+        self.probing = False
+
+
+class Backend:
+    def __init__(self, name: str, url: str, api_key: str, model: str, breaker: CircuitBreaker):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.breaker = breaker
+        self.latency = {"complete": LatencyTracker(), "stream": LatencyTracker()}
+
+
+class Router:
+    """Sends each call to the first healthy backend and hedges slow ones.
+
+    Every attempt is admitted through `admission` before it starts, so the
+    hedge timer and latency samples only cover the upstream call itself. If
+    the first attempt has not finished after the backend's recent
+    `hedge_quantile` latency, one duplicate goes to the next healthy backend
+    (or the same one when it is the only backend) and whichever succeeds
+    first wins; the other is cancelled. Hedges are capped at `max_ratio` of
+    calls so tail latency improves without doubling upstream spend, and are
+    skipped rather than queued when their backend has no capacity.
+
+    A failing backend is failed over immediately when another one is
+    healthy; only when none is left is the call retried, up to `retries`
+    times with backoff. With every circuit open, calls are rejected at once.
+    """
+
+    def __init__(
+        self,
+        backends: list,
+        admission,
+        hedge: bool,
+        hedge_quantile: float,
+        initial_delay: float,
+        min_delay: float,
+        max_delay: float,
+        max_ratio: float,
+        retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ):
+        self.backends = backends
+        self.admission = admission
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_ratio = max_ratio
+        self.retries = retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.calls = 0
+        self.hedges = 0
+
+    def next_backend(self, tried: list):
+        for backend in self.backends:
+            if backend not in tried and backend.breaker.allow():
+                return backend
+        return None
+
+    def hedge_delay(self, backend: Backend, kind: str):
+        observed = backend.latency[kind].quantile(self.hedge_quantile)
+        if observed is None:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, observed))
+
+    def may_hedge(self):
+        return self.hedge and self.hedges < self.max_ratio * self.calls
+
+    async def _attempt(self, backend: Backend, attempt, kind: str):
+        started = time.monotonic()
+        try:
+            result = await attempt(backend)
+        except UpstreamError as e:
+            if e.trips_breaker:
+                backend.breaker.failure()
+            elif e.backend_fault:
+                backend.breaker.release()
+            else:
+                backend.breaker.success()
+            if e.upstream_status == 429 and e.retry_after is not None:
+                # Hold back this backend only; the others keep their quota.
+                self.admission.pause_upstream(backend.name, e.retry_after)
+            raise
+        except BaseException:
+            backend.breaker.release()
+            raise
+        backend.breaker.success()
+        backend.latency[kind].add(time.monotonic() - started)
+        return result
+
+    def retryable(self, error: UpstreamError, retries: int):
+        return (
+            error.retryable
+            and retries < self.retries
+            and (error.retry_after or 0) <= self.retry_max_delay
+        )
+
+    async def run(self, attempt, kind: str = "complete", discard=None):
+        """Runs `attempt(backend)` with hedging, failover and retries.
+
+        Returns `(result, backend)`. `discard` is awaited on results that lost
+        the race (e.g. to close an open stream).
+        """
+        backend = self.next_backend([])
+        if backend is None:
+            # Every circuit is open: no point queueing for a backend that is
+            # known to be down.
+            retry_in = min(b.breaker.retry_in for b in self.backends)
+            raise HTTPException(
+                status_code=503,
+                detail="All upstream backends are unavailable",
+                headers=retry_after_header(retry_in),
+            )
+
+        self.calls += 1
+        tried = []
+        running = {}
+        retries = 0
+        waited = False
+
+        async def launch(backend: Backend, max_wait: float = None):
+            queued = time.perf_counter()
+            try:
+                await self.admission.acquire_upstream(backend.name, max_wait)
+            except BaseException:
+                backend.breaker.release()
+                raise
+            observe_stage("queue", time.perf_counter() - queued)
+            if backend not in tried:
+                tried.append(backend)
+            task = asyncio.create_task(self._attempt(backend, attempt, kind))
+            running[task] = backend
+
+        await launch(backend)
+        try:
+            while True:
+                timeout = None
+                if not waited and len(running) == 1:
+                    timeout = self.hedge_delay(next(iter(running.values())), kind)
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    waited = True
+                    if self.may_hedge():
+                        backend = self.next_backend(tried)
+                        if backend is None and tried[-1].breaker.state == "closed":
+                            backend = tried[-1]
+                        if backend is not None:
+                            try:
+                                # Never queue a hedge: if it cannot start now,
+                                # keep waiting on the attempt already running.
+                                await launch(backend, max_wait=0)
+                                self.hedges += 1
+                            except Overloaded:
+                                pass
+                    continue
+
+                error = None
+                for task in done:
+                    backend = running.pop(task)
+                    try:
+                        return task.result(), backend
+                    except UpstreamError as e:
+                        if not e.backend_fault:
+                            raise
+                        error = e
+                if running:
+                    continue
+
+                backend = self.next_backend(tried)
+                if backend is None and self.retryable(error, retries):
+                    # Nowhere left to fail over to: back off and try again on
+                    # whichever backend is still allowed through.
+                    await asyncio.sleep(backoff_delay(
+                        retries, self.retry_base_delay, self.retry_max_delay, error.retry_after
+                    ))
+                    retries += 1
+                    backend = self.next_backend([])
+                if backend is None:
+                    raise error
+                await launch(backend)
+        finally:
+            for task in running:
+                task.cancel()
+                task.add_done_callback(lambda t: _reap(t, discard))
+
+
+def _reap(task, discard):
+    # A loser may have finished before it could be cancelled: release its
+    # result and keep its exception from being reported as unhandled.
+    if task.cancelled() or task.exception() is not None:
+        return
+    if discard is not None:
+        asyncio.ensure_future(discard(task.result()))
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import secrets
+import time
+
+
+def estimate_tokens(text: str):
+    # Roughly 4 characters per token for English text and code; close enough
+    # for budgeting without shipping a tokenizer.
+    return len(text) // 4 + 1
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.summary = ""
+        self.messages = []
+        self.pending = []  # turns trimmed from the window, not yet summarized
+        self.summarizing = False
+        self.stored_size = 0  # size as last accounted by the SessionStore
+        self.last_used = time.monotonic()
+
+    @property
+    def size(self):
+        return len(self.summary) + sum(len(m["content"]) for m in self.messages + self.pending)
+
+    def context(self, token_budget: int):
+        """History to send ahead of a new message, within `token_budget`.
+
+        The newest whole turns come first; the rolling summary is only added
+        if it fits in what they leave over.
+        """
+        start = len(self.messages)
+        while start >= 2:
+            turn = self.messages[start - 2:start]
+            cost = sum(estimate_tokens(m["content"]) for m in turn)
+            if cost > token_budget:
+                break
+            token_budget -= cost
+            start -= 2
+
+        messages = []
+        if self.summary and estimate_tokens(self.summary) <= token_budget:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}"
+            })
+        return messages + self.messages[start:]
+
+    def append(self, user: str, assistant: str):
+        self.messages.append({"role": "user", "content": user})
+        self.messages.append({"role": "assistant", "content": assistant})
+
+    def trim(self, token_budget: int, max_messages: int, keep_pending: bool):
+        budget = token_budget - estimate_tokens(self.summary)
+        tokens = sum(estimate_tokens(m["content"]) for m in self.messages)
+        # Drop whole user/assistant turns so the window never starts mid-turn.
+        while self.messages and (tokens > budget or len(self.messages) > max_messages):
+            dropped = self.messages[:2]
+            del self.messages[:2]
+            tokens -= sum(estimate_tokens(m["content"]) for m in dropped)
+            if keep_pending:
+                self.pending.extend(dropped)
+
+
+class SessionStore:
+    """In-memory sessions with LRU eviction, an idle TTL and a byte cap.
+
+    The byte total is kept as a running sum; call `resize` after changing a
+    session so it is re-accounted.
+    """
+
+    def __init__(self, max_sessions: int, max_bytes: int, idle_ttl: float):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.size = 0
+        self._sessions = OrderedDict()
+
+    def create(self):
+        session = Session(secrets.token_urlsafe(16))
+        self._sessions[session.id] = session
+        self.evict()
+        return session
+
+    def get(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.idle_ttl:
+            self._remove(session_id)
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str):
+        return self._remove(session_id) is not None
+
+    def resize(self, session: Session):
+        if self._sessions.get(session.id) is not session:
+            return
+        size = session.size
+        self.size += size - session.stored_size
+        session.stored_size = size
+
+    def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.size -= session.stored_size
+        return session
+
+    def evict(self):
+        now = time.monotonic()
+        # Least recently used sessions sit at the front, so idle ones do too.
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.idle_ttl:
+                break
+            self._remove(oldest.id)
+
+        while self._sessions and (len(self._sessions) > self.max_sessions or self.size > self.max_bytes):
+            self._remove(next(iter(self._sessions)))
+
+    def __len__(self):
+        return len(self._sessions)
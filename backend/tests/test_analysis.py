@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import io
+
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from analysis import (
+    UploadLimitMiddleware,
+    analyze_file,
+    chunk_text,
+    hash_upload,
+    is_binary,
+    reduce_notes,
+)
+
+
+# ---------------- CHUNKING ----------------
+def test_chunks_break_at_definitions():
+    text = "import os\n\ndef a():\n    return 1\n\ndef b():\n    return 2\n"
+    chunks = chunk_text(text, max_chars=30)
+    assert chunks == ["import os\n\n", "def a():\n    return 1\n\n", "def b():\n    return 2\n"]
+    assert "".join(chunks) == text
+
+
+def test_small_definitions_are_packed_together():
+    text = "def a():\n    pass\ndef b():\n    pass\n"
+    assert chunk_text(text, max_chars=1000) == [text]
+
+
+def test_oversized_definitions_and_long_lines_are_split():
+    text = "def big():\n" + "    x = 1\n" * 50 + "y = '" + "z" * 500 + "'\n"
+    chunks = chunk_text(text, max_chars=100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_blank_text_has_no_chunks():
+    assert chunk_text("\n\n   \n", max_chars=100) == []
+
+
+def test_is_binary():
+    assert is_binary(b"\x89PNG\0\0")
+    assert not is_binary("print('hi')".encode())
+
+
+# ---------------- REDUCING ----------------
+def recording_complete(reply_size=None):
+    prompts = []
+
+    async def complete(prompt):
+        prompts.append(prompt)
+        return "n" * reply_size if reply_size else f"merged {len(prompts)}"
+
+    return complete, prompts
+
+
+def test_single_note_needs_no_call():
+    complete, prompts = recording_complete()
+    assert asyncio.run(reduce_notes(complete, ["only"], "{notes}", 100)) == "only"
+    assert prompts == []
+
+
+def test_notes_that_fit_are_reduced_in_one_call():
+    complete, prompts = recording_complete()
+    asyncio.run(reduce_notes(complete, ["a", "b", "c"], "NOTES {notes}", 100))
+    assert len(prompts) == 1
+    assert prompts[0].startswith("NOTES a")
+
+
+def test_reduction_is_tree_wise_when_notes_do_not_fit():
+    complete, prompts = recording_complete(reply_size=10)
+    notes = ["x" * 40 for _ in range(8)]
+    asyncio.run(reduce_notes(complete, notes, "{notes}", 100))
+    assert 1 < len(prompts) < len(notes)
+
+
+def test_reduction_terminates_when_replies_do_not_shrink():
+    # Every merge comes back as large as the limit, so grouping can never
+    # make progress; the reduction must still finish.
+    complete, prompts = recording_complete(reply_size=100)
+    notes = ["x" * 100 for _ in range(5)]
+    result = asyncio.run(reduce_notes(complete, notes, "{notes}", 100))
+    assert result == "n" * 100
+    assert len(prompts) == 1
+
+
+def test_analyze_file_reviews_each_chunk_then_merges():
+    complete, prompts = recording_complete()
+    text = "def a():\n    pass\n" * 10
+    analysis, chunks = asyncio.run(analyze_file(complete, "a.py", text, max_chars=40))
+    assert chunks == 5
+    assert len(prompts) == chunks + 1
+    assert analysis == "merged 6"
+
+
+def test_analyze_empty_file():
+    complete, prompts = recording_complete()
+    assert asyncio.run(analyze_file(complete, "a.py", "", 100)) == ("The file is empty.", 0)
+    assert prompts == []
+
+
+# ---------------- UPLOADS ----------------
+def test_hash_upload_and_size_limit():
+    data = b"print(1)\n" * 1000
+    upload = UploadFile(io.BytesIO(data), filename="a.py")
+    assert asyncio.run(hash_upload(upload, max_bytes=len(data), block_size=100)) == (
+        hashlib.sha256(data).hexdigest()
+    )
+    assert asyncio.run(upload.read()) == data  # rewound for the caller
+    assert asyncio.run(hash_upload(upload, max_bytes=len(data) - 1, block_size=100)) is None
+
+
+def limited_client():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, path="/upload", max_bytes=100)
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/other")
+    async def other(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_upload_limit_checks_content_length_and_streamed_bodies():
+    client = limited_client()
+    assert client.post("/upload", content=b"x" * 100).json() == {"size": 100}
+    assert client.post("/upload", content=b"x" * 101).status_code == 413
+
+    def chunked():
+        for _ in range(5):
+            yield b"x" * 30
+
+    response = client.post("/upload", content=chunked())
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Upload exceeds 100 bytes"}
+
+
+def test_upload_limit_applies_only_to_its_path():
+    assert limited_client().post("/other", content=b"x" * 500).json() == {"size": 500}
@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+from fastapi import HTTPException
+import pytest
+
+from batch import BatchJob, JobStore, retry_overloaded, run_batch, run_item
+from ratelimit import AdmissionControl, Overloaded
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+# ---------------- ITEMS ----------------
+def test_item_errors_become_results():
+    async def handle(item):
+        if item == "bad":
+            raise HTTPException(status_code=413, detail="too long")
+        if item == "boom":
+            raise RuntimeError("boom")
+        return {"reply": item}
+
+    async def scenario():
+        return [await run_item(i, item, handle) for i, item in enumerate(["ok", "bad", "boom"])]
+
+    assert asyncio.run(scenario()) == [
+        {"index": 0, "status": "ok", "reply": "ok"},
+        {"index": 1, "status": "error", "code": 413, "detail": "too long"},
+        {"index": 2, "status": "error", "code": 500, "detail": "boom"},
+    ]
+
+
+# ---------------- RUN ----------------
+def test_results_arrive_in_completion_order_within_concurrency():
+    running = 0
+    peak = 0
+
+    async def handle(delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return {"reply": delay}
+
+    results = asyncio.run(collect(run_batch([0.05, 0.01, 0.03, 0.02], handle, concurrency=2)))
+    assert [r["index"] for r in results] == [1, 2, 0, 3]
+    assert peak == 2
+
+
+def test_closing_the_generator_cancels_running_items():
+    cancelled = []
+
+    async def handle(item):
+        try:
+            await asyncio.sleep(0 if item == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        return {"reply": item}
+
+    async def scenario():
+        results = run_batch(list(range(4)), handle, concurrency=3)
+        first = await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(scenario())["index"] == 0
+    assert sorted(cancelled) == [1, 2, 3]
+
+
+def test_empty_batch():
+    async def handle(item):
+        return {}
+
+    assert asyncio.run(collect(run_batch([], handle, concurrency=4))) == []
+
+
+# ---------------- OVERLOAD ----------------
+def test_overload_is_retried_until_capacity_frees_up():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise Overloaded("busy", retry_after=0.01)
+        return "ok"
+
+    assert asyncio.run(retry_overloaded(call, max_wait=1, base_delay=0.01, max_delay=0.05)) == "ok"
+    assert len(calls) == 3
+
+
+def test_overload_wait_is_bounded():
+    async def call():
+        raise Overloaded("busy", retry_after=0.05)
+
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        asyncio.run(retry_overloaded(call, max_wait=0.2, base_delay=0.01, max_delay=0.05))
+    assert time.monotonic() - started < 0.5
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise HTTPException(status_code=400, detail="bad")
+
+    with pytest.raises(HTTPException):
+        asyncio.run(retry_overloaded(call, max_wait=1, base_delay=0.01, max_delay=0.05))
+    assert len(calls) == 1
+
+
+def test_items_are_charged_to_the_client_quota():
+    admission = AdmissionControl(
+        client_limit=2, global_limit=60, window=0.2, global_burst=1,
+        max_waiters=10, queue_timeout=1,
+    )
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(4):
+            await admission.acquire_client("c")
+        return time.monotonic() - started
+
+    # Two tokens of burst, then one every 0.1 s.
+    assert 0.15 < asyncio.run(scenario()) < 0.4
+
+
+# ---------------- JOBS ----------------
+def test_job_records_results_and_failures():
+    job = BatchJob(total=3)
+    job.record({"index": 2, "status": "ok"})
+    job.record({"index": 0, "status": "error"})
+    state = job.to_dict(offset=1, limit=2)
+    assert (state["completed"], state["failed"]) == (2, 1)
+    assert state["results"] == [None, {"index": 2, "status": "ok"}]
+
+
+def test_job_store_limits_and_expires_jobs():
+    store = JobStore(max_jobs=1, ttl=0.01)
+    job = BatchJob(total=1)
+    store.add(job)
+    with pytest.raises(HTTPException) as info:
+        store.add(BatchJob(total=1))
+    assert info.value.status_code == 503
+
+    job.finish("done")
+    time.sleep(0.02)
+    assert store.get(job.id) is None
+    store.add(BatchJob(total=1))
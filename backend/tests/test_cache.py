@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from cache import MemoryBackend, ResponseCache, cache_key
+
+
+def payload(content, **extra):
+    return {"model": "m", "messages": [{"role": "user", "content": content}], **extra}
+
+
+# ---------------- KEYS ----------------
+def test_key_ignores_surrounding_and_trailing_whitespace_and_stream_flag():
+    assert cache_key(payload("  hello  \n")) == cache_key(payload("hello"))
+    assert cache_key(payload("a  \nb")) == cache_key(payload("a\nb"))
+    assert cache_key(payload("hi", stream=True)) == cache_key(payload("hi"))
+
+
+def test_key_keeps_indentation():
+    inside = "if x:\n    y = 1\n    return 2"
+    outside = "if x:\n    y = 1\nreturn 2"
+    assert cache_key(payload(inside)) != cache_key(payload(outside))
+
+
+def test_key_depends_on_model():
+    assert cache_key(payload("hi")) != cache_key({**payload("hi"), "model": "other"})
+
+
+# ---------------- MEMORY BACKEND ----------------
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryBackend(max_entries=2, max_bytes=10_000)
+        await backend.set("a", {"v": 1}, ttl=60)
+        await backend.set("b", {"v": 2}, ttl=60)
+        await backend.get("a")
+        await backend.set("c", {"v": 3}, ttl=60)
+        return [await backend.get(k) for k in "abc"]
+
+    assert asyncio.run(scenario()) == [{"v": 1}, None, {"v": 3}]
+
+
+def test_memory_backend_expires_entries():
+    async def scenario():
+        backend = MemoryBackend(max_entries=10, max_bytes=10_000)
+        await backend.set("a", {"v": 1}, ttl=-1)
+        return await backend.get("a"), backend.size
+
+    assert asyncio.run(scenario()) == (None, 0)
+
+
+# ---------------- FETCH ----------------
+def make_cache():
+    return ResponseCache(MemoryBackend(max_entries=10, max_bytes=10_000), ttl=60)
+
+
+def test_fetch_miss_then_hit():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"reply": "r"}, True
+
+    async def scenario():
+        cache = make_cache()
+        return [await cache.fetch("k", loader) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [({"reply": "r"}, "MISS"), ({"reply": "r"}, "HIT")]
+    assert len(calls) == 1
+
+
+def test_concurrent_fetches_share_one_load():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"reply": "r"}, True
+
+    async def scenario():
+        cache = make_cache()
+        return await asyncio.gather(*[cache.fetch("k", loader) for _ in range(3)])
+
+    statuses = [status for _, status in asyncio.run(scenario())]
+    assert sorted(statuses) == ["COALESCED", "COALESCED", "MISS"]
+    assert len(calls) == 1
+
+
+def test_load_error_reaches_every_waiter_and_is_not_cached():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def working():
+        return {"reply": "r"}, True
+
+    async def scenario():
+        cache = make_cache()
+        results = await asyncio.gather(
+            *[cache.fetch("k", failing) for _ in range(2)], return_exceptions=True
+        )
+        assert not cache._inflight
+        return results, await cache.fetch("k", working)
+
+    errors, retry = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert retry == ({"reply": "r"}, "MISS")
+
+
+def test_uncacheable_values_are_returned_but_not_stored():
+    async def loader():
+        return {"reply": "fallback"}, False
+
+    async def scenario():
+        cache = make_cache()
+        first = await cache.fetch("k", loader)
+        return first, await cache.get("k")
+
+    assert asyncio.run(scenario()) == (({"reply": "fallback"}, "MISS"), None)
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    async def loader():
+        await asyncio.sleep(0.05)
+        return {"reply": "r"}, True
+
+    async def scenario():
+        cache = make_cache()
+        first = asyncio.create_task(cache.fetch("k", loader))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.fetch("k", loader))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ({"reply": "r"}, "COALESCED")
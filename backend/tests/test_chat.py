@@ -0,0 +1,48 @@
+import json
+
+from fastapi.testclient import TestClient
+import httpx
+import pytest
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # A primary model other than config.MODEL, as set through UPSTREAM_BACKENDS.
+    monkeypatch.setattr(main, "UPSTREAM_BACKENDS", [
+        {"name": "primary", "url": "http://primary/chat", "api_key": "k", "model": "big-model"},
+        {"name": "fallback", "url": "http://fallback/chat", "api_key": "k", "model": "small-model"},
+    ])
+    monkeypatch.setattr(main, "CACHE_ENABLED", True)
+    calls = []
+    failing = set()
+
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append((request.url.host, body["model"]))
+        if request.url.host in failing:
+            return httpx.Response(503, text="down")
+        return httpx.Response(200, json={"choices": [{"message": {"content": body["model"]}}]})
+
+    with TestClient(main.app) as client:
+        main.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        client.calls = calls
+        client.failing = failing
+        yield client
+
+
+def test_primary_replies_are_cached_under_the_primary_model(client):
+    statuses = [client.post("/chat", json={"message": "hi"}).headers["X-Cache"] for _ in range(3)]
+    assert statuses == ["MISS", "HIT", "HIT"]
+    assert client.calls == [("primary", "big-model")]
+
+
+def test_failover_replies_are_not_cached(client):
+    client.failing.add("primary")
+    first = client.post("/chat", json={"message": "hi"})
+    assert first.json() == {"reply": "small-model"}
+
+    client.failing.clear()
+    second = client.post("/chat", json={"message": "hi"})
+    assert (second.json(), second.headers["X-Cache"]) == ({"reply": "big-model"}, "MISS")
@@ -0,0 +1,148 @@
+import asyncio
+import email.utils
+import time
+
+from fastapi import HTTPException
+from starlette.requests import Request
+import pytest
+
+from ratelimit import (
+    AdmissionControl,
+    Overloaded,
+    TokenBucket,
+    backoff_delay,
+    client_id,
+    parse_retry_after,
+)
+
+
+def make_admission(**options):
+    settings = dict(
+        client_limit=2, global_limit=60, window=60, global_burst=1,
+        max_waiters=10, queue_timeout=1,
+    )
+    settings.update(options)
+    return AdmissionControl(**settings)
+
+
+# ---------------- TOKEN BUCKET ----------------
+def test_reservations_queue_up_behind_each_other():
+    bucket = TokenBucket(rate=10, capacity=1)
+    assert bucket.reserve(max_wait=1) == 0
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.2, abs=0.01)
+
+
+def test_reservation_over_max_wait_takes_nothing():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.reserve(max_wait=0)
+    assert bucket.reserve(max_wait=0.5) is None
+    assert bucket.tokens == pytest.approx(0, abs=0.01)
+
+
+def test_refund_never_exceeds_capacity():
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.refund()
+    assert bucket.tokens == 2
+    bucket.reserve(max_wait=0)
+    bucket.refund()
+    assert bucket.tokens == pytest.approx(2)
+
+
+def test_pause_blocks_for_the_given_time():
+    bucket = TokenBucket(rate=10, capacity=5)
+    bucket.pause(2)
+    assert bucket.wait_time() == pytest.approx(2.1, abs=0.01)
+
+
+# ---------------- RETRY-AFTER / BACKOFF ----------------
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    when = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < parse_retry_after(when) <= 30
+
+
+def test_backoff_is_capped_and_honours_retry_after():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= 4
+    assert 10 <= backoff_delay(0, base=0.5, cap=4, retry_after=10) <= 10.5
+
+
+# ---------------- CLIENT ID ----------------
+def request_from(host, headers=()):
+    scope = {"type": "http", "client": (host, 1234) if host else None, "headers": list(headers)}
+    return Request(scope)
+
+
+def test_client_id_ignores_forwarded_for():
+    request = request_from("10.0.0.5", [(b"x-forwarded-for", b"1.2.3.4")])
+    assert client_id(request) == "10.0.0.5"
+    assert client_id(request_from(None)) == "unknown"
+
+
+# ---------------- ADMISSION ----------------
+def test_client_over_quota_gets_429_with_retry_after():
+    admission = make_admission()
+    admission.check_client("a")
+    admission.check_client("a")
+    with pytest.raises(HTTPException) as info:
+        admission.check_client("a")
+    assert info.value.status_code == 429
+    assert int(info.value.headers["Retry-After"]) >= 1
+    admission.check_client("b")  # other clients are unaffected
+
+
+def test_client_table_is_bounded():
+    admission = make_admission(max_clients=2)
+    for key in "abc":
+        admission.check_client(key)
+    assert list(admission.clients) == ["b", "c"]
+
+
+def test_upstream_wait_over_queue_timeout_is_rejected():
+    admission = make_admission(queue_timeout=0.5)
+
+    async def scenario():
+        await admission.acquire_upstream("groq")
+        await admission.acquire_upstream("groq")
+
+    with pytest.raises(Overloaded) as info:
+        asyncio.run(scenario())
+    assert info.value.status_code == 503
+    assert info.value.retry_after > 0.5
+
+
+def test_upstream_queue_is_bounded():
+    admission = make_admission(global_limit=600, max_waiters=1)
+
+    async def scenario():
+        await admission.acquire_upstream("groq")
+        waiter = asyncio.create_task(admission.acquire_upstream("groq"))
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(Overloaded, match="queue full"):
+                await admission.acquire_upstream("groq")
+        finally:
+            waiter.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_its_token_back():
+    admission = make_admission(global_limit=600)
+
+    async def scenario():
+        await admission.acquire_upstream("groq")
+        waiter = asyncio.create_task(admission.acquire_upstream("groq"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return admission.waiting, admission.upstream["groq"].tokens
+
+    waiting, tokens = asyncio.run(scenario())
+    assert waiting == 0
+    assert tokens > -0.5  # the reservation was refunded
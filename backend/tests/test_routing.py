@@ -0,0 +1,205 @@
+import asyncio
+import time
+
+from fastapi import HTTPException
+import pytest
+
+from ratelimit import AdmissionControl
+from routing import Backend, CircuitBreaker, Router, UpstreamError
+
+
+def make_router(names=("a", "b"), admission=None, **options):
+    backends = [
+        Backend(name, f"http://{name}", "key", f"model-{name}", CircuitBreaker(2, 30))
+        for name in names
+    ]
+    if admission is None:
+        admission = AdmissionControl(
+            client_limit=100, global_limit=6000, window=60, global_burst=100,
+            max_waiters=100, queue_timeout=1,
+        )
+    settings = dict(
+        hedge=False, hedge_quantile=0.95, initial_delay=1, min_delay=0.01,
+        max_delay=1, max_ratio=1, retries=2, retry_base_delay=0.01, retry_max_delay=1,
+    )
+    settings.update(options)
+    return Router(backends, admission, **settings)
+
+
+# ---------------- BREAKER ----------------
+def test_breaker_opens_after_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_released_probe_can_be_retried():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+# ---------------- FAILOVER ----------------
+def test_fails_over_without_retrying_the_failed_backend():
+    router = make_router()
+    calls = []
+
+    async def attempt(backend):
+        calls.append(backend.name)
+        if backend.name == "a":
+            raise UpstreamError("unavailable", 503, retryable=True)
+        return "ok"
+
+    result, backend = asyncio.run(router.run(attempt))
+    assert (result, backend.name) == ("ok", "b")
+    assert calls == ["a", "b"]
+
+
+def test_retries_with_backoff_when_no_other_backend_is_left():
+    router = make_router(names=("a",))
+    calls = []
+
+    async def attempt(backend):
+        calls.append(backend.name)
+        if len(calls) == 1:
+            raise UpstreamError("unavailable", 503, retryable=True)
+        return "ok"
+
+    result, _ = asyncio.run(router.run(attempt))
+    assert result == "ok"
+    assert calls == ["a", "a"]
+
+
+def test_request_errors_are_not_failed_over():
+    router = make_router()
+    calls = []
+
+    async def attempt(backend):
+        calls.append(backend.name)
+        raise UpstreamError("bad request", 400)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(router.run(attempt))
+    assert calls == ["a"]
+
+
+def test_all_circuits_open_fails_immediately():
+    router = make_router()
+    for backend in router.backends:
+        backend.breaker.failure()
+        backend.breaker.failure()
+    calls = []
+
+    async def attempt(backend):
+        calls.append(backend.name)
+        return "ok"
+
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(router.run(attempt))
+    assert info.value.status_code == 503
+    assert int(info.value.headers["Retry-After"]) > 0
+    assert calls == []
+
+
+def test_429_pauses_only_its_own_backend():
+    router = make_router()
+
+    async def attempt(backend):
+        if backend.name == "a":
+            raise UpstreamError("slow down", 429, retryable=True, retry_after=30)
+        return "ok"
+
+    result, backend = asyncio.run(router.run(attempt))
+    assert (result, backend.name) == ("ok", "b")
+    upstream = router.admission.upstream
+    assert upstream["a"].wait_time() > 20
+    assert upstream["b"].wait_time() == 0
+
+
+# ---------------- HEDGING ----------------
+def test_hedge_without_capacity_does_not_cancel_the_primary():
+    # One token per backend and no refill to speak of: the hedge cannot be
+    # admitted and must be skipped while the primary keeps running.
+    admission = AdmissionControl(
+        client_limit=100, global_limit=1, window=3600, global_burst=1,
+        max_waiters=100, queue_timeout=1,
+    )
+    router = make_router(names=("a",), admission=admission, hedge=True, initial_delay=0.02)
+
+    async def attempt(backend):
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    result, _ = asyncio.run(router.run(attempt))
+    assert result == "ok"
+    assert router.hedges == 0
+
+
+def test_hedge_wins_and_loser_is_discarded():
+    router = make_router(hedge=True, initial_delay=0.02)
+    discarded = []
+
+    async def attempt(backend):
+        await asyncio.sleep(0.2 if backend.name == "a" else 0.01)
+        return backend.name
+
+    async def discard(result):
+        discarded.append(result)
+
+    result, backend = asyncio.run(router.run(attempt, discard=discard))
+    assert (result, backend.name) == ("b", "b")
+    assert router.hedges == 1
+    # The slow primary was cancelled, not finished and discarded.
+    assert discarded == []
+    assert router.backends[0].breaker.state == "closed"
+
+
+def test_429s_fail_over_but_do_not_open_the_circuit():
+    router = make_router(names=("a",), retries=0)
+
+    async def attempt(backend):
+        raise UpstreamError("slow down", 429, retryable=True, retry_after=0.01)
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(UpstreamError):
+                await router.run(attempt)
+
+    asyncio.run(scenario())
+    assert router.backends[0].breaker.state == "closed"
+
+
+def test_5xx_opens_the_circuit():
+    router = make_router(names=("a",), retries=0)
+
+    async def attempt(backend):
+        raise UpstreamError("unavailable", 503, retryable=True)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await router.run(attempt)
+
+    asyncio.run(scenario())
+    assert router.backends[0].breaker.state == "open"
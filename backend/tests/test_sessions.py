@@ -0,0 +1,102 @@
+import time
+
+from sessions import Session, SessionStore, estimate_tokens
+
+
+def session_with(turns, summary=""):
+    session = Session("s")
+    session.summary = summary
+    for user, assistant in turns:
+        session.append(user, assistant)
+    return session
+
+
+# ---------------- CONTEXT ----------------
+def test_context_keeps_newest_whole_turns_within_budget():
+    session = session_with([("a" * 40, "b" * 40), ("c" * 40, "d" * 40)])
+    turn = 2 * estimate_tokens("a" * 40)
+    context = session.context(turn + 1)
+    assert [m["content"][0] for m in context] == ["c", "d"]
+    assert session.context(0) == []
+
+
+def test_context_prefers_newest_turn_over_summary():
+    session = session_with([("a" * 40, "b" * 40)], summary="s" * 400)
+    turn = 2 * estimate_tokens("a" * 40)
+    context = session.context(turn + 5)
+    assert [m["role"] for m in context] == ["user", "assistant"]
+
+
+def test_context_adds_summary_when_it_fits():
+    session = session_with([("a", "b")], summary="earlier")
+    context = session.context(100)
+    assert context[0]["role"] == "system"
+    assert "earlier" in context[0]["content"]
+    assert [m["content"] for m in context[1:]] == ["a", "b"]
+
+
+# ---------------- TRIM ----------------
+def test_trim_drops_whole_oldest_turns_into_pending():
+    session = session_with([("1", "1"), ("2", "2"), ("3", "3")])
+    session.trim(token_budget=1000, max_messages=4, keep_pending=True)
+    assert [m["content"] for m in session.messages] == ["2", "2", "3", "3"]
+    assert [m["content"] for m in session.pending] == ["1", "1"]
+
+
+def test_trim_respects_token_budget_and_summary():
+    session = session_with([("a" * 40, "b" * 40), ("c" * 40, "d" * 40)], summary="s" * 40)
+    budget = 2 * estimate_tokens("a" * 40) + estimate_tokens("s" * 40)
+    session.trim(token_budget=budget, max_messages=100, keep_pending=False)
+    assert [m["content"][0] for m in session.messages] == ["c", "d"]
+    assert session.pending == []
+
+
+# ---------------- STORE ----------------
+def test_store_keeps_a_running_byte_total():
+    store = SessionStore(max_sessions=10, max_bytes=10_000, idle_ttl=60)
+    a, b = store.create(), store.create()
+    a.append("hello", "world")
+    store.resize(a)
+    b.append("x", "y")
+    store.resize(b)
+    assert store.size == a.size + b.size
+
+    a.trim(token_budget=0, max_messages=0, keep_pending=False)
+    store.resize(a)
+    assert store.size == b.size
+
+    store.delete(b.id)
+    assert store.size == 0
+
+
+def test_store_evicts_least_recently_used_over_byte_cap():
+    store = SessionStore(max_sessions=10, max_bytes=20, idle_ttl=60)
+    old, new = store.create(), store.create()
+    for session in (old, new):
+        session.append("x" * 6, "y" * 6)
+        store.resize(session)
+    store.get(old.id)  # touch: `new` becomes least recently used
+    store.evict()
+    assert store.get(new.id) is None
+    assert store.get(old.id) is old
+    assert store.size == old.size
+
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(max_sessions=10, max_bytes=10_000, idle_ttl=0.01)
+    session = store.create()
+    session.append("a", "b")
+    store.resize(session)
+    time.sleep(0.02)
+    assert store.get(session.id) is None
+    assert store.size == 0
+    assert len(store) == 0
+
+
+def test_resize_ignores_sessions_no_longer_stored():
+    store = SessionStore(max_sessions=10, max_bytes=10_000, idle_ttl=60)
+    session = store.create()
+    store.delete(session.id)
+    session.append("a", "b")
+    store.resize(session)
+    assert store.size == 0
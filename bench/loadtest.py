@@ -0,0 +1,269 @@
+"""Load-tests the backend against the local chat completions stub.
+
+For each gunicorn worker count, starts the backend (as in backend/Dockerfile)
+pointed at bench/stub_server.py, drives /chat or /chat/stream at a fixed
+concurrency, and reports throughput, p50/p95/p99 latency and time to first
+token. Results are written as JSON so runs can be compared across versions
+and worker configurations.
+
+    python bench/loadtest.py --workers 1 2 4 --concurrency 64 --requests 2000
+    python bench/loadtest.py --mode stream --label stream-4w --workers 4
+    python bench/loadtest.py --workers 4 --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from stub_server import PATH, add_stub_arguments, stub_argv
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+RESULTS = Path(__file__).resolve().parent / "results"
+
+# Keep admission control and the cache out of the way unless a run asks for
+# them: the point is to measure the request path, not to hit the limiter.
+BACKEND_ENV = {
+    "GROQ_API_KEY": "bench",
+    "GEMINI_API_KEY": "",
+    "HTTP2": "false",
+    "RATE_LIMIT": "100000000",
+    "GLOBAL_RATE_LIMIT": "100000000",
+    "GLOBAL_RATE_BURST": "100000",
+    "QUEUE_MAX_WAITERS": "100000",
+    "CACHE_ENABLED": "false",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def percentiles(values: list):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+    }
+
+
+# ---------------- LOAD ----------------
+async def one_request(client: httpx.AsyncClient, mode: str, index: int, cache: bool):
+    # Unique prompts so neither the cache nor request coalescing kick in.
+    body = {"message": f"benchmark prompt {index}", "cache": cache}
+    started = time.perf_counter()
+    first_token = None
+
+    if mode == "stream":
+        async with client.stream("POST", "/chat/stream", json=body) as response:
+            async for line in response.aiter_lines():
+                if first_token is None and line.startswith('data: {"delta"'):
+                    first_token = time.perf_counter() - started
+        status = response.status_code
+    else:
+        response = await client.post("/chat", json=body)
+        status = response.status_code
+
+    latency = time.perf_counter() - started
+    return status, latency, first_token if mode == "stream" else latency
+
+
+async def drive(base_url: str, mode: str, concurrency: int, requests: int, warmup: int, cache: bool):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*[one_request(client, mode, -i - 1, cache) for i in range(warmup)])
+
+        counter = iter(range(requests))
+        results = []
+
+        async def worker():
+            for index in counter:
+                try:
+                    results.append(await one_request(client, mode, index, cache))
+                except httpx.HTTPError as e:
+                    results.append((type(e).__name__, None, None))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r[0] == 200]
+    errors = {}
+    for status, _, _ in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    return {
+        "duration_s": elapsed,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_s": percentiles([r[1] for r in ok]),
+        "ttft_s": percentiles([r[2] for r in ok if r[2] is not None]),
+    }
+
+
+def run_config(args: argparse.Namespace, workers: int, stub_url: str):
+    port = free_port()
+    env = {**os.environ, **BACKEND_ENV, **dict(kv.split("=", 1) for kv in args.env)}
+    env["GROQ_URL"] = stub_url + PATH
+    backend = subprocess.Popen(
+        [
+            "gunicorn", "-k", "uvicorn.workers.UvicornWorker", "main:app",
+            "--workers", str(workers), "--bind", f"127.0.0.1:{port}",
+            "--log-level", "warning",
+        ],
+        cwd=BACKEND,
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url + "/health")
+        result = asyncio.run(drive(
+            base_url, args.mode, args.concurrency, args.requests, args.warmup, args.cache
+        ))
+    finally:
+        stop(backend)
+    return {"workers": workers, **result}
+
+
+# ---------------- REPORT ----------------
+def fmt(stats: dict, key: str):
+    return f"{stats[key] * 1000:8.1f}" if stats else "       -"
+
+
+def print_run(run: dict, baseline: dict = None):
+    lat, ttft = run["latency_s"], run["ttft_s"]
+    line = (
+        f"workers={run['workers']:<3} rps={run['throughput_rps']:8.1f} "
+        f"p50={fmt(lat, 'p50')}ms p95={fmt(lat, 'p95')}ms p99={fmt(lat, 'p99')}ms "
+        f"ttft_p50={fmt(ttft, 'p50')}ms ok={run['ok']}/{run['requests']}"
+    )
+    if run["errors"]:
+        line += f" errors={run['errors']}"
+    print(line)
+
+    if baseline and baseline["latency_s"] and lat:
+        def delta(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(
+            f"    vs baseline: rps {delta(run['throughput_rps'], baseline['throughput_rps'])} "
+            f"p50 {delta(lat['p50'], baseline['latency_s']['p50'])} "
+            f"p99 {delta(lat['p99'], baseline['latency_s']['p99'])}"
+        )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="gunicorn worker counts to compare")
+    parser.add_argument("--mode", choices=["chat", "stream"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="extra backend environment, e.g. HEDGE_ENABLED=false")
+    parser.add_argument("--label", default=None, help="results file name (default: timestamp)")
+    parser.add_argument("--compare", type=Path, default=None, help="results JSON to compare against")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("stub_server.py")),
+         "--port", str(stub_port), *stub_argv(args)],
+    )
+    try:
+        wait_until_up(stub_url + "/stats")
+        runs = []
+        for workers in args.workers:
+            runs.append(run_config(args, workers, stub_url))
+            print_run(runs[-1])
+        upstream = httpx.get(stub_url + "/stats").json()
+    finally:
+        stop(stub)
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "meta": {
+            "timestamp": now.isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cache": args.cache,
+            "env": args.env,
+            "stub": stub_argv(args),
+            "upstream": upstream,
+        },
+        "runs": runs,
+    }
+
+    RESULTS.mkdir(exist_ok=True)
+    path = RESULTS / f"{args.label or now.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"results written to {path.relative_to(ROOT)}")
+
+    if args.compare:
+        baseline = {r["workers"]: r for r in json.loads(args.compare.read_text())["runs"]}
+        print(f"compared with {args.compare}:")
+        for run in runs:
+            print_run(run, baseline.get(run["workers"]))
+
+
+if __name__ == "__main__":
+    main()
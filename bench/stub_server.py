@@ -0,0 +1,158 @@
+"""Local stand-in for the Groq /openai/v1/chat/completions API.
+
+Replies after a configurable time to first byte, then "generates" tokens at
+a fixed rate, optionally as an SSE stream, and can inject 429 and 5xx
+responses. Nothing is sent to a real model, so benchmarks burn no quota.
+
+    python bench/stub_server.py --port 9100 --ttfb lognormal:0.3:0.5 --rate-429 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+PATH = "/openai/v1/chat/completions"
+
+
+def parse_distribution(spec: str):
+    """fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA | exp:MEAN (seconds)."""
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda: median * random.lognormvariate(0, sigma)
+    if kind == "exp":
+        return lambda: random.expovariate(1 / params[0])
+    raise argparse.ArgumentTypeError(f"unknown distribution: {spec}")
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ttfb", default="lognormal:0.25:0.4",
+                        help="time-to-first-byte distribution (default: %(default)s)")
+    parser.add_argument("--tokens", type=int, default=150, help="completion tokens per reply")
+    parser.add_argument("--token-rate", type=float, default=750, help="tokens per second")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stub_argv(args: argparse.Namespace):
+    """Turns parsed stub options back into a command line for a subprocess."""
+    argv = [
+        "--ttfb", args.ttfb,
+        "--tokens", str(args.tokens),
+        "--token-rate", str(args.token_rate),
+        "--rate-429", str(args.rate_429),
+        "--rate-5xx", str(args.rate_5xx),
+        "--retry-after", str(args.retry_after),
+    ]
+    if args.seed is not None:
+        argv += ["--seed", str(args.seed)]
+    return argv
+
+
+def create_app(args: argparse.Namespace):
+    app = FastAPI(title="Chat completions stub")
+    ttfb = parse_distribution(args.ttfb)
+    stats = {"requests": 0, "429": 0, "5xx": 0}
+
+    def usage(body: dict):
+        prompt = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4 + 1
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": args.tokens,
+            "total_tokens": prompt + args.tokens,
+        }
+
+    def chunk(body: dict, delta: dict, **extra):
+        data = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}] if delta else [],
+            **extra,
+        }
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def stream(body: dict):
+        # Tokens are flushed every 20 ms so high token rates do not turn into
+        # thousands of tiny writes.
+        tick = 0.02
+        per_tick = max(1, int(args.token_rate * tick))
+        yield chunk(body, {"role": "assistant", "content": ""})
+        sent = 0
+        while sent < args.tokens:
+            n = min(per_tick, args.tokens - sent)
+            await asyncio.sleep(n / args.token_rate)
+            yield chunk(body, {"content": "tok " * n})
+            sent += n
+        yield chunk(body, None, usage=usage(body))
+        yield "data: [DONE]\n\n"
+
+    @app.post(PATH)
+    async def completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        roll = random.random()
+        if roll < args.rate_429:
+            stats["429"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (stub)", "type": "tokens"}},
+                status_code=429,
+                headers={"Retry-After": str(args.retry_after)},
+            )
+        if roll < args.rate_429 + args.rate_5xx:
+            stats["5xx"] += 1
+            return JSONResponse({"error": {"message": "Service unavailable (stub)"}}, status_code=503)
+
+        await asyncio.sleep(ttfb())
+
+        if body.get("stream"):
+            return StreamingResponse(stream(body), media_type="text/event-stream")
+
+        await asyncio.sleep(args.tokens / args.token_rate)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "tok " * args.tokens},
+                "finish_reason": "stop",
+            }],
+            "usage": usage(body),
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
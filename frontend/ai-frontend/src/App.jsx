@@ -20,16 +20,40 @@ export default function App() {
     setReply("");
 
     try {
-      const res = await fetch(`${API_BASE}/chat`, {
+      const res = await fetch(`${API_BASE}/chat/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ message: prompt }),
       });
 
-      const data = await res.json();
-      if (!res.ok) throw new Error(data.detail);
-
-      setReply(data.reply);
+      if (!res.ok) {
+        const data = await res.json();
+        throw new Error(data.detail);
+      }
+
+      // Server-Sent Events: frames are separated by a blank line.
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = frame.match(/^data: (.*)$/m)?.[1];
+          if (!data) continue;
+
+          const payload = JSON.parse(data);
+          if (event === "error") throw new Error(payload.detail);
+          if (payload.delta) setReply((prev) => prev + payload.delta);
+        }
+      }
     } catch {
       setError("Request failed");
     } finally {
@@ -62,19 +86,31 @@ ${repoUrl}
   const handleFileAnalysis = async () => {
     if (!files.length) return;
 
-    let content = "";
+    setLoading(true);
+    setError("");
+    setReply("");
+
+    // The backend chunks and analyzes the files itself.
+    const form = new FormData();
     for (let file of files) {
-      content += `\n\nFILE: ${file.name}\n`;
-      content += await file.text();
+      form.append("files", file);
     }
 
-    const prompt = `
-Analyze and explain the following code files clearly.
-Focus on logic, issues, and improvements.
+    try {
+      const res = await fetch(`${API_BASE}/analyze/files`, {
+        method: "POST",
+        body: form,
+      });
 
-${content}
-    `;
-    sendPrompt(prompt);
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.detail);
+
+      setReply(data.reply);
+    } catch {
+      setError("Request failed");
+    } finally {
+      setLoading(false);
+    }
   };
 
   return (